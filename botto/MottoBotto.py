@@ -1,6 +1,10 @@
+import asyncio
+import functools
 import logging
+import os
 import random
 import re
+import signal
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from emoji import UNICODE_EMOJI
@@ -10,7 +14,10 @@ import discord
 from airtable import Airtable
 from discord import Message, Member, DeletedReferencedMessage
 
+import moderation
 import reactions
+import regex_guard
+from config import load as load_config
 from message_checks import is_botto, is_dm
 
 log = logging.getLogger("MottoBotto")
@@ -18,6 +25,7 @@ log.setLevel(logging.DEBUG)
 
 
 CHANNEL_REGEX = re.compile("<#(\d+)>")
+CONFIG_WATCH_IDLE_SECONDS = 30
 
 
 class MottoBotto(discord.Client):
@@ -26,11 +34,26 @@ class MottoBotto(discord.Client):
         config: dict,
         mottos: Airtable,
         members: Airtable,
+        config_path: Optional[str] = None,
     ):
         self.config = config
+        self.config_path = config_path
+        self._config_mtime = self._get_config_mtime()
+        self._config_lock = None
         self.mottos = mottos
         self.members = members
 
+        self._support_users = None
+        self._support_users_fetched = None
+        self._support_users_expiry = None
+        self._refreshing_support_users = False
+        self._help_message = None
+        self.moderation_queue = None
+        self.regex_stats = {}
+        self.regex_worker = regex_guard.RegexWorker()
+        self._regex_isolation_worker = regex_guard.RegexWorker()
+        self._finding_slow_patterns = False
+
         log.info(
             "Replies are enabled"
             if self.config["should_reply"]
@@ -42,8 +65,88 @@ class MottoBotto(discord.Client):
         intents = discord.Intents(messages=True, guilds=True, reactions=True)
         super().__init__(intents=intents)
 
-    async def on_ready(self):
-        log.info("We have logged in as {0.user}".format(self))
+    async def start(self, *args, **kwargs):
+        if self.config_path:
+            try:
+                self.loop.add_signal_handler(
+                    signal.SIGHUP, lambda: self.loop.create_task(self.reload_config())
+                )
+            except (NotImplementedError, AttributeError):
+                log.debug("Reloading config on SIGHUP is not supported here")
+            self.loop.create_task(self.watch_config())
+        await super().start(*args, **kwargs)
+
+    async def close(self):
+        self.regex_worker.close()
+        self._regex_isolation_worker.close()
+        await super().close()
+
+    def _get_config_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.config_path).st_mtime if self.config_path else None
+        except OSError:
+            return None
+
+    async def watch_config(self):
+        """
+        Reloads the config whenever the config file is modified, checking
+        every `config_reload_seconds`. While this is 0, the file isn't checked,
+        but the setting is re-read so a reload can turn watching back on.
+        """
+        while True:
+            interval = self.config["config_reload_seconds"]
+            await asyncio.sleep(interval or CONFIG_WATCH_IDLE_SECONDS)
+            if not interval:
+                continue
+            mtime = self._get_config_mtime()
+            if mtime is not None and mtime != self._config_mtime:
+                await self.reload_config()
+
+    async def reload_config(self) -> bool:
+        """
+        Re-reads the config file and swaps it in. The file is parsed, and its
+        patterns benchmarked, in the executor so the event loop isn't blocked.
+        If the new config is invalid, the current config is kept.
+        :return: True if the config was reloaded, otherwise False
+        """
+        if self._config_lock is None:
+            self._config_lock = asyncio.Lock()
+        async with self._config_lock:
+            self._config_mtime = self._get_config_mtime()
+            try:
+                new_config = await self.loop.run_in_executor(
+                    None, load_config, self.config_path
+                )
+            except Exception as err:
+                log.error(f"Config file invalid, keeping current config: {err}")
+                return False
+            self._apply_config(new_config)
+            return True
+
+    def _apply_config(self, new_config: dict):
+        if new_config["authentication"] != self.config["authentication"]:
+            log.warning("Authentication changes will not apply until restart")
+        watching_status_changed = (
+            new_config["watching_status"] != self.config["watching_status"]
+        )
+
+        refresh_minutes_changed = (
+            new_config["support_users_refresh_minutes"]
+            != self.config["support_users_refresh_minutes"]
+        )
+
+        self.config = new_config
+        self._help_message = None
+        if refresh_minutes_changed:
+            self._update_support_users_expiry()
+        log.info("Config reloaded")
+        log.info("Responding to phrases: %s", self.config["triggers"])
+        log.info("Rules: %s", self.config["rules"])
+
+        if watching_status_changed and self.is_ready():
+            self.loop.create_task(self.update_presence())
+
+    async def update_presence(self):
         await self.change_presence(
             activity=discord.Activity(
                 type=discord.ActivityType.watching,
@@ -51,6 +154,11 @@ class MottoBotto(discord.Client):
             )
         )
 
+    async def on_ready(self):
+        log.info("We have logged in as {0.user}".format(self))
+        await self.update_presence()
+        await self.refresh_support_users()
+
     async def on_disconnect(self):
         log.warning("Bot disconnected")
 
@@ -111,9 +219,11 @@ class MottoBotto(discord.Client):
                 await reactions.duplicate(self, message)
                 return
 
-            self.mottos.update(
+            motto_record = self.mottos.update(
                 motto_record["id"], {"Motto": actual_motto, "Approved by Author": True}
             )
+            if self.config["human_moderation_required"]:
+                moderation.add_to_queue(self, motto_record)
             await reactions.stored(self, message, motto_message)
 
             nominee = await self.get_or_add_member(reactor)
@@ -156,6 +266,8 @@ class MottoBotto(discord.Client):
                     f"Removing {member_record['fields']['Username']} ({member_record['id']}"
                 )
                 self.members.delete(member_record["id"])
+                if member_record["fields"].get("Support"):
+                    self.invalidate_support_users()
             await message.remove_reaction(
                 self.config["reactions"]["pending"], self.user
             )
@@ -214,16 +326,66 @@ class MottoBotto(discord.Client):
         matching_mottos = self.mottos.get_all(filterByFormula=filter_formula)
         return bool(matching_mottos)
 
-    def is_valid_message(self, message: Message) -> bool:
-        if (
-            not all(r.search(message.content) for r in self.config["rules"]["matching"])
-            or any(r.search(message.content) for r in self.config["rules"]["excluding"])
-            or any(
-                r.match(message.content) for r in self.config["triggers"]["new_motto"]
+    async def run_regex_check(
+        self, message: Message, func, *args, checks: list
+    ) -> Optional[bool]:
+        """
+        Runs a regex check, in the worker process if `regex_timeout_ms` is set,
+        and records each pattern's timing.
+        :param message: the message being checked
+        :param func: the regex_guard check to run
+        :param args: the arguments to the check
+        :param checks: (compiled pattern, "search" or "match") for each pattern the check uses
+        :return: the result of the check, or None if it timed out
+        """
+        if timeout_ms := self.config["regex_timeout_ms"]:
+            try:
+                result, timings = await self.regex_worker.run(
+                    func, *args, timeout=timeout_ms / 1000
+                )
+            except asyncio.TimeoutError:
+                log.error(
+                    f"{func.__name__} timed out after {timeout_ms}ms on message {message.id}"
+                )
+                if not self._finding_slow_patterns:
+                    self.loop.create_task(
+                        self.find_slow_patterns(message.content, checks, timeout_ms)
+                    )
+                return None
+        else:
+            result, timings = func(*args)
+        regex_guard.record(self.regex_stats, timings, self.config["regex_warn_ms"])
+        return result
+
+    async def find_slow_patterns(self, content: str, checks: list, timeout_ms: int):
+        self._finding_slow_patterns = True
+        try:
+            await regex_guard.find_slow_patterns(
+                self._regex_isolation_worker,
+                self.regex_stats,
+                content,
+                checks,
+                timeout_ms / 1000,
             )
-        ):
-            return False
-        return True
+        finally:
+            self._finding_slow_patterns = False
+
+    async def is_valid_message(self, message: Message) -> bool:
+        rules = self.config["rules"]
+        triggers = self.config["triggers"]["new_motto"]
+        checks = [(r, "search") for r in rules["matching"] + rules["excluding"]] + [
+            (t, "match") for t in triggers
+        ]
+        return bool(
+            await self.run_regex_check(
+                message,
+                regex_guard.is_valid,
+                message.content,
+                rules,
+                triggers,
+                checks=checks,
+            )
+        )
 
     def get_name(self, member: Member):
         return member.nick if getattr(member, "nick", None) else member.display_name
@@ -305,7 +467,13 @@ class MottoBotto(discord.Client):
         if self.config["trigger_on_mention"]:
             triggers = [re.compile(rf"^<@!?\s?{self.user.id}>")] + triggers
 
-        if not any(t.match(message.content) for t in triggers):
+        if not await self.run_regex_check(
+            message,
+            regex_guard.is_trigger,
+            message.content,
+            triggers,
+            checks=[(t, "match") for t in triggers],
+        ):
             return
 
         if is_botto(message, self.user):
@@ -318,7 +486,7 @@ class MottoBotto(discord.Client):
 
         motto_message: Message = message.reference.resolved
 
-        if not self.is_valid_message(motto_message):
+        if not await self.is_valid_message(motto_message):
             await reactions.invalid(self, message)
             return
 
@@ -383,40 +551,7 @@ class MottoBotto(discord.Client):
         message_content = message.content.lower().strip()
 
         if message_content in ("!help", "help", "help!", "halp", "halp!", "!halp"):
-            trigger = (
-                f"@{self.user.display_name}"
-                if self.config["trigger_on_mention"]
-                else "a trigger word"
-            )
-
-            help_message = f"""
-Reply to a great motto in the supported channels with {trigger} to tell me about it! (Note: you can't nominate yourself.)
-
-You can DM me the following commands:
-`!link`: Get a link to the leaderboard.
-`!emoji <emoji>`: Set your emoji on the leaderboard. A response of {self.config["reactions"]["invalid_emoji"]} means the emoji you requested is not valid.
-`!emoji`: Clear your emoji from the leaderboard.
-`!nick on`: Use your server-specific nickname on the leaderboard instead of your Discord username. Nickname changes will auto-update the next time you approve a motto.
-`!nick off`: Use your Discord username on the leaderboard instead of your server-specific nickname.
-`!delete`: Remove all your data from MottoBotto. Confirmation is required.
-""".strip()
-
-            help_channel = self.config["support_channel"]
-            users = ", ".join(
-                f"<@{user['Discord ID']}>" for user in self.get_support_users()
-            )
-
-            if help_channel or users:
-                message_add = "\nIf your question was not answered here, please"
-                if help_channel:
-                    message_add = f"{message_add} ask for help in #{help_channel}"
-                    if users:
-                        message_add = f"{message_add}, or"
-                if users:
-                    message_add = f"{message_add} DM one of the following users: {users}. They are happy to receive your DMs about MottoBotto without prior permission but otherwise usual rules apply"
-                help_message = f"{help_message}\n{message_add}."
-
-            await message.author.dm_channel.send(help_message)
+            await message.author.dm_channel.send(self.get_help_message())
             return
 
         if message_content == "!version":
@@ -488,15 +623,141 @@ You can DM me the following commands:
 
             return
 
+        if message_content and moderation.is_moderator(self, message):
+
+            command, *args = message.content.replace(",", " ").split()
+            command = command.lower()
+
+            if command == "!queue":
+                await moderation.queue(self, message, args[0].lower() if args else None)
+                return
+
+            if command == "!reload" and self.config_path:
+                if await self.reload_config():
+                    await message.author.dm_channel.send("Config reloaded.")
+                else:
+                    await message.author.dm_channel.send(
+                        "The config file is invalid, so the current config has been kept. See the logs for details."
+                    )
+                return
+
+            if command == "!regexstats":
+                await message.author.dm_channel.send(
+                    regex_guard.summarise(self.regex_stats)
+                )
+                return
+
+            if command in ("!approve", "!reject"):
+                await moderation.moderate(
+                    self, message, approve=command == "!approve", ids=args
+                )
+                return
+
         await reactions.unknown_dm(self, message)
 
-    def get_support_users(self):
-        return [
-            x["fields"]
-            for x in self.members.get_all(
-                sort=["Username"], filterByFormula="{Support}=TRUE()"
+    def get_support_users(self) -> list:
+        """
+        Gets the members flagged as support users from the cache. Once the
+        cache is older than `support_users_refresh_minutes`, it is refreshed
+        in the background and the current list is served until that finishes.
+        :return: the fields of each support user's member record
+        """
+        if self._support_users_expiry is None or (
+            datetime.now(timezone.utc) >= self._support_users_expiry
+        ):
+            self.start_support_users_refresh()
+        return self._support_users or []
+
+    def start_support_users_refresh(self):
+        if not self._refreshing_support_users:
+            self.loop.create_task(self.refresh_support_users())
+
+    async def refresh_support_users(self):
+        """
+        Fetches the support users from Airtable in the executor, rebuilding the
+        help message if they have changed.
+        """
+        if self._refreshing_support_users:
+            return
+        self._refreshing_support_users = True
+        try:
+            records = await self.loop.run_in_executor(
+                None,
+                functools.partial(
+                    self.members.get_all,
+                    sort=["Username"],
+                    filterByFormula="{Support}=TRUE()",
+                ),
             )
-        ]
+        except Exception:
+            log.error("Failed to fetch support users", exc_info=True)
+            return
+        finally:
+            self._refreshing_support_users = False
+
+        self._support_users_fetched = datetime.now(timezone.utc)
+        self._update_support_users_expiry()
+        support_users = [x["fields"] for x in records]
+        if support_users != self._support_users:
+            log.debug(f"Support users changed: {support_users}")
+            self._support_users = support_users
+            self._help_message = None
+
+    def _update_support_users_expiry(self):
+        if self._support_users_fetched is not None:
+            self._support_users_expiry = self._support_users_fetched + timedelta(
+                minutes=self.config["support_users_refresh_minutes"]
+            )
+
+    def invalidate_support_users(self):
+        self._support_users_expiry = None
+        self.start_support_users_refresh()
+
+    def get_help_message(self) -> str:
+        """
+        Gets the `!help` response, building it only when the config or the
+        support users have changed since it was last built.
+        :return: the help message
+        """
+        support_users = self.get_support_users()
+        if self._help_message is not None:
+            return self._help_message
+
+        trigger = (
+            f"@{self.user.display_name}"
+            if self.config["trigger_on_mention"]
+            else "a trigger word"
+        )
+
+        help_message = f"""
+Reply to a great motto in the supported channels with {trigger} to tell me about it! (Note: you can't nominate yourself.)
+
+You can DM me the following commands:
+`!link`: Get a link to the leaderboard.
+`!emoji <emoji>`: Set your emoji on the leaderboard. A response of {self.config["reactions"]["invalid_emoji"]} means the emoji you requested is not valid.
+`!emoji`: Clear your emoji from the leaderboard.
+`!nick on`: Use your server-specific nickname on the leaderboard instead of your Discord username. Nickname changes will auto-update the next time you approve a motto.
+`!nick off`: Use your Discord username on the leaderboard instead of your server-specific nickname.
+`!delete`: Remove all your data from MottoBotto. Confirmation is required.
+""".strip()
+
+        help_channel = self.config["support_channel"]
+        users = ", ".join(f"<@{user['Discord ID']}>" for user in support_users)
+
+        if help_channel or users:
+            message_add = "\nIf your question was not answered here, please"
+            if help_channel:
+                message_add = f"{message_add} ask for help in #{help_channel}"
+                if users:
+                    message_add = f"{message_add}, or"
+            if users:
+                message_add = f"{message_add} DM one of the following users: {users}. They are happy to receive your DMs about MottoBotto without prior permission but otherwise usual rules apply"
+            help_message = f"{help_message}\n{message_add}."
+
+        # Don't keep a message built before the support users have been fetched
+        if self._support_users is not None:
+            self._help_message = help_message
+        return help_message
 
     async def remove_unapproved_messages(self):
 
@@ -1,6 +1,9 @@
+import json
 import re
 import os
 
+import regex_guard
+
 
 def parse(config):
 
@@ -50,7 +53,14 @@ def parse(config):
         "trigger_on_mention": True,
         "confirm_delete_reaction": "🧨",
         "support_channel": None,
+        "support_users_refresh_minutes": 60,
         "watching_status": "for inspiration",
+        "moderators": [],
+        "moderation_page_size": 5,
+        "config_reload_seconds": 30,
+        "regex_warn_ms": 10,
+        "regex_reject_ms": 100,
+        "regex_timeout_ms": None,
     }
 
     for key in defaults.keys():
@@ -69,6 +79,15 @@ def parse(config):
     for key, rules in defaults["rules"].items():
         defaults["rules"][key] = [re.compile(r, re.MULTILINE) for r in rules]
 
+    regex_guard.check_patterns(
+        [p for patterns in defaults["triggers"].values() for p in patterns]
+        + [p for patterns in defaults["rules"].values() for p in patterns],
+        defaults["regex_warn_ms"],
+        defaults["regex_reject_ms"],
+    )
+
+    defaults["moderators"] = {str(m) for m in defaults["moderators"]}
+
     # Environment variables override config files
 
     if token := os.getenv("MOTTOBOTTO_DISCORD_TOKEN"):
@@ -81,3 +100,14 @@ def parse(config):
         defaults["authentication"]["airtable_base"] = token
 
     return defaults
+
+
+def load(path):
+    """
+    Reads and parses a config file.
+    :param path: the path to the JSON config file
+    :return: the parsed config
+    :raises OSError, ValueError, re.error: if the file can't be read or is invalid
+    """
+    with open(path) as f:
+        return parse(json.load(f))
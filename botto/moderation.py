@@ -0,0 +1,199 @@
+import asyncio
+import functools
+import logging
+import re
+
+from discord import Message
+
+import MottoBotto
+from regex_guard import DISCORD_MESSAGE_LIMIT
+
+log = logging.getLogger("MottoBotto").getChild("moderation")
+log.setLevel(logging.DEBUG)
+
+# Airtable accepts at most 10 records per request, and 5 requests per second per base
+AIRTABLE_BATCH_SIZE = 10
+AIRTABLE_CONCURRENCY = 5
+# Record IDs per re-check, keeping the filter formula well within URL length limits
+RECHECK_BATCH_SIZE = 50
+MAX_LISTED_IDS = 10
+# A page of the queue is kept within a single Discord message, leaving room for
+# the header and footer
+MAX_PAGE_SIZE = 25
+PAGE_TEXT_LIMIT = DISCORD_MESSAGE_LIMIT - 200
+
+PENDING_FORMULA = "AND({Approved by Author}, NOT({Approved}))"
+RECORD_ID_REGEX = re.compile(r"^rec[A-Za-z0-9]{14}$")
+
+
+def is_moderator(botto: MottoBotto, message: Message) -> bool:
+    return str(message.author.id) in botto.config["moderators"]
+
+
+async def load_queue(botto: MottoBotto):
+    """
+    Rebuilds the local index of mottos approved by their author but not yet by a moderator.
+    """
+    records = await asyncio.get_running_loop().run_in_executor(
+        None,
+        functools.partial(
+            botto.mottos.get_all, sort=["Date"], filterByFormula=PENDING_FORMULA
+        ),
+    )
+    botto.moderation_queue = {record["id"]: record["fields"] for record in records}
+    log.info(f"Loaded {len(botto.moderation_queue)} mottos pending moderation")
+
+
+async def _load_queue_or_reply(botto: MottoBotto, message: Message) -> bool:
+    try:
+        await load_queue(botto)
+    except Exception:
+        log.error("Failed to load mottos pending moderation", exc_info=True)
+        await message.author.dm_channel.send(
+            "Something went wrong reading from Airtable. Please try again."
+        )
+        return False
+    return True
+
+
+def add_to_queue(botto: MottoBotto, motto_record: dict):
+    if botto.moderation_queue is not None:
+        botto.moderation_queue[motto_record["id"]] = motto_record["fields"]
+
+
+def _filter_pending(botto: MottoBotto, ids: list) -> list:
+    """
+    Checks Airtable for which of the given mottos are still pending moderation,
+    as the local index may be stale.
+    """
+    id_formula = ", ".join(f"RECORD_ID()='{i}'" for i in ids)
+    return [
+        record["id"]
+        for record in botto.mottos.get_all(
+            fields=["Motto"],
+            filterByFormula=f"AND({PENDING_FORMULA}, OR({id_formula}))",
+        )
+    ]
+
+
+async def _run_batches(func, items: list, batch_size: int = AIRTABLE_BATCH_SIZE):
+    """
+    Applies a blocking Airtable function to `items` in chunks of `batch_size`,
+    running the chunks concurrently in the default executor.
+    :return: the result for each chunk
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(AIRTABLE_CONCURRENCY)
+
+    async def run(chunk):
+        async with semaphore:
+            return await loop.run_in_executor(None, func, chunk)
+
+    return await asyncio.gather(
+        *(run(items[i : i + batch_size]) for i in range(0, len(items), batch_size))
+    )
+
+
+async def queue(botto: MottoBotto, message: Message, option: str = None):
+    if botto.moderation_queue is None or option == "refresh":
+        if not await _load_queue_or_reply(botto, message):
+            return
+        if option == "refresh":
+            option = None
+
+    try:
+        page = int(option) if option else 1
+    except ValueError:
+        page = 1
+    page_size = min(botto.config["moderation_page_size"], MAX_PAGE_SIZE)
+    pages = max(1, -(-len(botto.moderation_queue) // page_size))
+    page = min(max(page, 1), pages)
+
+    records = list(botto.moderation_queue.items())[
+        (page - 1) * page_size : page * page_size
+    ]
+    if not records:
+        await message.author.dm_channel.send("There are no mottos pending moderation.")
+        return
+
+    lines = [
+        f"Mottos pending moderation (page {page} of {pages}, {len(botto.moderation_queue)} total):"
+    ]
+    line_length = PAGE_TEXT_LIMIT // len(records)
+    for record_id, fields in records:
+        line = f"`{record_id}`: {fields.get('Motto')}"
+        if len(line) > line_length:
+            line = f"{line[:line_length - 1]}…"
+        lines.append(line)
+    if page < pages:
+        lines.append(f"Type `!queue {page + 1}` for the next page.")
+    await message.author.dm_channel.send("\n".join(lines))
+
+
+async def moderate(botto: MottoBotto, message: Message, approve: bool, ids: list):
+    command = "!approve" if approve else "!reject"
+    if not ids:
+        await message.author.dm_channel.send(
+            f"Type `{command}` followed by one or more motto IDs from `!queue`."
+        )
+        return
+
+    if botto.moderation_queue is None:
+        if not await _load_queue_or_reply(botto, message):
+            return
+
+    ids = list(dict.fromkeys(ids))
+    found = [i for i in ids if RECORD_ID_REGEX.match(i) and i in botto.moderation_queue]
+
+    if found:
+        try:
+            pending = await _run_batches(
+                functools.partial(_filter_pending, botto), found, RECHECK_BATCH_SIZE
+            )
+        except Exception:
+            log.error("Failed to check mottos pending moderation", exc_info=True)
+            await message.author.dm_channel.send(
+                "Something went wrong reading from Airtable. Please try again."
+            )
+            return
+        pending = {i for chunk in pending for i in chunk}
+        for i in found:
+            if i not in pending and botto.moderation_queue is not None:
+                log.info(f"Motto {i} is no longer pending moderation")
+                botto.moderation_queue.pop(i, None)
+        found = [i for i in found if i in pending]
+
+    unknown = [i for i in ids if i not in found]
+
+    if found:
+        log.info(
+            f"{message.author} is {'approving' if approve else 'rejecting'} {len(found)} mottos"
+        )
+        try:
+            if approve:
+                await _run_batches(
+                    botto.mottos.batch_update,
+                    [{"id": i, "fields": {"Approved": True}} for i in found],
+                )
+            else:
+                await _run_batches(botto.mottos.batch_delete, found)
+        except Exception:
+            log.error("Failed to moderate mottos", exc_info=True)
+            # Some batches may have been applied, so start afresh next time
+            botto.moderation_queue = None
+            await message.author.dm_channel.send(
+                "Something went wrong updating Airtable. Please check `!queue` and try again."
+            )
+            return
+        # The queue may have been reloaded while Airtable was being updated
+        if botto.moderation_queue is not None:
+            for i in found:
+                botto.moderation_queue.pop(i, None)
+
+    response = f"{'Approved' if approve else 'Rejected'} {len(found)} mottos."
+    if unknown:
+        listed = ", ".join(f"`{i[:20]}`" for i in unknown[:MAX_LISTED_IDS])
+        if len(unknown) > MAX_LISTED_IDS:
+            listed = f"{listed} and {len(unknown) - MAX_LISTED_IDS} more"
+        response = f"{response} Not pending moderation: {listed}."
+    await message.author.dm_channel.send(response)
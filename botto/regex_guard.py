@@ -0,0 +1,360 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+log = logging.getLogger("MottoBotto").getChild("regex_guard")
+log.setLevel(logging.DEBUG)
+
+DISCORD_MESSAGE_LIMIT = 2000
+BENCHMARK_TIMEOUT_SECONDS = 2
+STATS_LIMIT = 10
+STATS_PATTERN_LENGTH = 100
+
+# Characters appended to a long run to force a failed match, and so full backtracking
+FAILURE_SUFFIXES = ("", "!", "\x00")
+
+# Long runs of the characters user patterns typically repeat
+ADVERSARIAL_INPUTS = [
+    (run * DISCORD_MESSAGE_LIMIT)[: DISCORD_MESSAGE_LIMIT - 1] + end
+    for run in ("a", "A", "1", " ", "\n", "a ", "a\n", "<@", "!", ".")
+    for end in FAILURE_SUFFIXES
+]
+
+_CATEGORY_SAMPLES = {
+    sre_parse.CATEGORY_DIGIT: "1",
+    sre_parse.CATEGORY_NOT_DIGIT: "a",
+    sre_parse.CATEGORY_SPACE: " ",
+    sre_parse.CATEGORY_NOT_SPACE: "a",
+    sre_parse.CATEGORY_WORD: "a",
+    sre_parse.CATEGORY_NOT_WORD: " ",
+    sre_parse.CATEGORY_LINEBREAK: "\n",
+    sre_parse.CATEGORY_NOT_LINEBREAK: "a",
+}
+
+# The re module holds the GIL and can't be interrupted, so patterns are run in
+# a separate process that can be terminated if they take too long.
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+# Atomic groups and possessive repeats (Python 3.11+) don't backtrack
+_ATOMIC_GROUP = getattr(sre_parse, "ATOMIC_GROUP", None)
+_POSSESSIVE_REPEAT = getattr(sre_parse, "POSSESSIVE_REPEAT", None)
+
+_mp = multiprocessing.get_context(
+    "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+)
+
+
+def _sample_in(items) -> str:
+    """
+    Finds a character matched by a character class.
+    """
+    if items and items[0][0] == sre_parse.NEGATE:
+        excluded = set()
+        for op, av in items[1:]:
+            if op == sre_parse.LITERAL:
+                excluded.add(chr(av))
+            elif op == sre_parse.RANGE:
+                excluded.update(chr(c) for c in range(av[0], min(av[1], 127) + 1))
+            elif op == sre_parse.CATEGORY:
+                excluded.add(_CATEGORY_SAMPLES.get(av, ""))
+        return next((c for c in "a1 !~\x01é" if c not in excluded), "")
+    for op, av in items:
+        if op == sre_parse.LITERAL:
+            return chr(av)
+        if op == sre_parse.RANGE:
+            return chr(av[0])
+        if op == sre_parse.CATEGORY:
+            return _CATEGORY_SAMPLES.get(av, "a")
+    return ""
+
+
+def _sample(tree, nonempty: bool = False) -> str:
+    """
+    Builds a short string matched by a parsed (sub)pattern, ignoring anchors,
+    lookarounds and backreferences.
+    :param nonempty: repeat optional parts once rather than leaving them out
+    """
+    sample = ""
+    for op, av in tree:
+        if op == sre_parse.LITERAL:
+            sample += chr(av)
+        elif op == sre_parse.NOT_LITERAL:
+            sample += "b" if chr(av) == "a" else "a"
+        elif op == sre_parse.ANY:
+            sample += "a"
+        elif op == sre_parse.IN:
+            sample += _sample_in(av)
+        elif op == sre_parse.SUBPATTERN:
+            sample += _sample(av[-1], nonempty)
+        elif op == sre_parse.BRANCH:
+            sample += _sample(av[1][0], nonempty)
+        elif op in _REPEATS or op == _POSSESSIVE_REPEAT:
+            sample += _sample(av[2], nonempty) * (max(av[0], 1) if nonempty else av[0])
+        elif op == _ATOMIC_GROUP:
+            sample += _sample(av, nonempty)
+    return sample
+
+
+def _repeated_runs(tree, prefix: str = ""):
+    """
+    Yields, for each repeat in a parsed pattern, the text needed to reach it
+    followed by the repeated text, so the repeat is driven as hard as possible.
+    """
+    for i, (op, av) in enumerate(tree):
+        reach = prefix + _sample(tree[:i])
+        if op in _REPEATS:
+            body = _sample(av[2], nonempty=True)
+            if body and av[1] > 1:
+                yield reach, body
+            yield from _repeated_runs(av[2], reach)
+        elif op == sre_parse.SUBPATTERN:
+            yield from _repeated_runs(av[-1], reach)
+        elif op == _ATOMIC_GROUP:
+            yield from _repeated_runs(av, reach)
+        elif op == _POSSESSIVE_REPEAT:
+            yield from _repeated_runs(av[2], reach)
+        elif op == sre_parse.BRANCH:
+            for branch in av[1]:
+                yield from _repeated_runs(branch, reach)
+
+
+def adversarial_inputs(pattern) -> list:
+    """
+    Builds inputs likely to make a pattern backtrack: long runs of the text
+    matched by each of its repeats, each followed by a character that forces
+    a failed match, along with runs of commonly repeated characters.
+    :param pattern: the compiled pattern
+    :return: the inputs, each at most a Discord message long
+    """
+    inputs = list(ADVERSARIAL_INPUTS)
+    runs = dict.fromkeys(
+        _repeated_runs(sre_parse.parse(pattern.pattern, pattern.flags))
+    )
+    for reach, body in runs:
+        count = max(1, (DISCORD_MESSAGE_LIMIT - len(reach) - 1) // len(body))
+        inputs.extend(reach + body * count + end for end in FAILURE_SUFFIXES)
+    return inputs
+
+
+def benchmark(pattern) -> float:
+    """
+    Times a compiled pattern against adversarial inputs.
+    :param pattern: the compiled pattern
+    :return: the slowest search time, in seconds
+    """
+    worst = 0
+    for text in adversarial_inputs(pattern):
+        start = time.perf_counter()
+        pattern.search(text)
+        worst = max(worst, time.perf_counter() - start)
+    return worst
+
+
+def check_patterns(
+    patterns: list,
+    warn_ms: Optional[int],
+    reject_ms: Optional[int],
+    timeout: float = BENCHMARK_TIMEOUT_SECONDS,
+):
+    """
+    Benchmarks user-supplied patterns when a config is loaded, so a pattern
+    prone to catastrophic backtracking is caught before it can stall the bot.
+    :param patterns: the compiled patterns
+    :param warn_ms: log a warning for patterns slower than this
+    :param reject_ms: reject patterns slower than this
+    :param timeout: reject patterns that take longer than this many seconds in total
+    :raises ValueError: if any pattern is slower than `reject_ms`
+    """
+    if warn_ms is None and reject_ms is None:
+        return
+
+    slow = []
+    pool = _mp.Pool(1)
+    try:
+        for pattern in patterns:
+            try:
+                elapsed_ms = pool.apply_async(benchmark, (pattern,)).get(timeout) * 1000
+            except multiprocessing.TimeoutError:
+                pool.terminate()
+                pool = _mp.Pool(1)
+                elapsed_ms = None
+
+            if elapsed_ms is None or (reject_ms is not None and elapsed_ms > reject_ms):
+                log.error(
+                    "Pattern %r is too slow: %s",
+                    pattern.pattern,
+                    (
+                        "timed out"
+                        if elapsed_ms is None
+                        else f"{elapsed_ms:.1f}ms on adversarial input"
+                    ),
+                )
+                slow.append(pattern.pattern)
+            elif warn_ms is not None and elapsed_ms > warn_ms:
+                log.warning(
+                    "Pattern %r is slow: %.1fms on adversarial input",
+                    pattern.pattern,
+                    elapsed_ms,
+                )
+    finally:
+        pool.terminate()
+
+    if slow and reject_ms is not None:
+        raise ValueError(f"Patterns too slow on adversarial input: {slow}")
+
+
+def _timed(timings: dict, pattern, method: str, content: str):
+    start = time.perf_counter()
+    result = getattr(pattern, method)(content)
+    timings[pattern.pattern] = time.perf_counter() - start
+    return result
+
+
+def is_valid(content: str, rules: dict, triggers: list):
+    """
+    Checks a nominated motto against the rules, timing each pattern.
+    :param content: the text of the nominated message
+    :param rules: the compiled `matching` and `excluding` rules
+    :param triggers: the compiled `new_motto` triggers
+    :return: whether the message is valid, and the seconds taken by each pattern
+    """
+    timings = {}
+    valid = (
+        all(_timed(timings, r, "search", content) for r in rules["matching"])
+        and not any(_timed(timings, r, "search", content) for r in rules["excluding"])
+        and not any(_timed(timings, t, "match", content) for t in triggers)
+    )
+    return valid, timings
+
+
+def is_trigger(content: str, triggers: list):
+    """
+    Checks whether a message starts with a trigger, timing each pattern.
+    :param content: the text of the message
+    :param triggers: the compiled triggers
+    :return: whether any trigger matched, and the seconds taken by each pattern
+    """
+    timings = {}
+    matched = any(_timed(timings, t, "match", content) for t in triggers)
+    return matched, timings
+
+
+def time_pattern(pattern, method: str, content: str) -> float:
+    timings = {}
+    _timed(timings, pattern, method, content)
+    return timings[pattern.pattern]
+
+
+def _counters(stats: dict, pattern: str) -> dict:
+    return stats.setdefault(pattern, {"count": 0, "total": 0, "max": 0, "timeouts": 0})
+
+
+def record(stats: dict, timings: dict, warn_ms: Optional[int] = None):
+    """
+    Adds pattern timings to the running per-pattern counters.
+    :param stats: pattern -> {"count", "total", "max", "timeouts"}, in seconds
+    :param timings: pattern -> seconds for a single run
+    :param warn_ms: log a warning for any run slower than this
+    """
+    for pattern, elapsed in timings.items():
+        counters = _counters(stats, pattern)
+        counters["count"] += 1
+        counters["total"] += elapsed
+        counters["max"] = max(counters["max"], elapsed)
+        if warn_ms is not None and elapsed * 1000 > warn_ms:
+            log.warning("Pattern %r took %.1fms", pattern, elapsed * 1000)
+
+
+async def find_slow_patterns(
+    worker, stats: dict, content: str, checks: list, timeout: float
+):
+    """
+    Runs each pattern of a set that timed out on its own, to find and record
+    the ones responsible.
+    :param worker: the RegexWorker to run the patterns in
+    :param stats: the per-pattern counters
+    :param content: the text of the message that timed out
+    :param checks: (compiled pattern, "search" or "match") for each pattern in the set
+    :param timeout: the timeout for each pattern, in seconds
+    """
+    for pattern, method in checks:
+        try:
+            elapsed = await worker.run(
+                time_pattern, pattern, method, content, timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            log.error(
+                "Pattern %r timed out after %.0fms", pattern.pattern, timeout * 1000
+            )
+            _counters(stats, pattern.pattern)["timeouts"] += 1
+        else:
+            record(stats, {pattern.pattern: elapsed})
+
+
+def summarise(stats: dict, limit: int = STATS_LIMIT) -> str:
+    """
+    Describes the slowest patterns, keeping within a single Discord message.
+    :param stats: the per-pattern counters
+    :param limit: the number of patterns to include
+    :return: the summary
+    """
+    if not stats:
+        return "No patterns have been run yet."
+    slowest = sorted(
+        stats.items(), key=lambda x: (x[1]["timeouts"], x[1]["max"]), reverse=True
+    )
+    lines = ["Slowest patterns (count, mean, max, timeouts):"]
+    for pattern, c in slowest[:limit]:
+        if len(pattern) > STATS_PATTERN_LENGTH:
+            pattern = f"{pattern[:STATS_PATTERN_LENGTH]}…"
+        mean = c["total"] / c["count"] * 1000 if c["count"] else 0
+        lines.append(
+            f"`{pattern}`: {c['count']}, {mean:.2f}ms, {c['max'] * 1000:.2f}ms, {c['timeouts']}"
+        )
+    if len(slowest) > limit:
+        lines.append(f"…and {len(slowest) - limit} more.")
+    return "\n".join(lines)
+
+
+class RegexWorker:
+    """
+    Runs functions in a worker process, replacing the worker if it times out.
+    Calls run one at a time, so each timeout only covers its own execution.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._lock = None
+        # Waiting for results in its own thread keeps the default executor free
+        # for Airtable requests, however many checks are queued
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def run(self, func, *args, timeout: float):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._pool is None:
+                self._pool = _mp.Pool(1)
+            pool = self._pool
+            result = pool.apply_async(func, args)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._executor, result.get, timeout
+                )
+            except multiprocessing.TimeoutError:
+                pool.terminate()
+                if self._pool is pool:
+                    self._pool = None
+                raise asyncio.TimeoutError()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
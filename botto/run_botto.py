@@ -1,12 +1,12 @@
 import os
-import json
+import re
 import logging
 import logging.config
 
 from airtable import Airtable
 
 from MottoBotto import MottoBotto
-from config import parse
+from config import load
 
 # Configure logging
 logging.config.fileConfig(fname="log.conf", disable_existing_loggers=False)
@@ -19,8 +19,8 @@ log = logging.getLogger("MottoBotto")
 try:
     config_path = os.getenv("MOTTOBOTTO_CONFIG", "config.json")
     log.debug(f"Config path: %s", config_path)
-    config = parse(json.load(open(config_path)))
-except (IOError, OSError, ValueError) as err:
+    config = load(config_path)
+except (IOError, OSError, ValueError, re.error) as err:
     log.error(f"Config file invalid: {err}")
     exit(1)
 
@@ -37,5 +37,5 @@ members = Airtable(
     config["authentication"]["airtable_key"],
 )
 
-client = MottoBotto(config, mottos, members)
+client = MottoBotto(config, mottos, members, config_path)
 client.run(config["authentication"]["discord"])
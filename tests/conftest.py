@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The bot is run from within botto/, so its modules import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "botto"))
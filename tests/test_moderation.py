@@ -0,0 +1,181 @@
+import asyncio
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import config
+import moderation
+from regex_guard import DISCORD_MESSAGE_LIMIT
+
+RECORD_ID_FORMULA = re.compile(r"RECORD_ID\(\)='([^']*)'")
+
+
+def record_id(n):
+    return f"rec{n:014d}"
+
+
+class StubMottos:
+    def __init__(self, pending, fail=False):
+        self.pending = pending
+        self.fail = fail
+        self.formulas = []
+        self.batches = []
+
+    def get_all(self, **options):
+        if self.fail:
+            raise IOError("Airtable is down")
+        formula = options["filterByFormula"]
+        self.formulas.append(formula)
+        ids = RECORD_ID_FORMULA.findall(formula)
+        if not ids:
+            return [{"id": i, "fields": f} for i, f in self.pending.items()]
+        return [{"id": i, "fields": self.pending[i]} for i in ids if i in self.pending]
+
+    def batch_update(self, records):
+        if self.fail:
+            raise IOError("Airtable is down")
+        self.batches.append(records)
+
+    def batch_delete(self, ids):
+        if self.fail:
+            raise IOError("Airtable is down")
+        self.batches.append(ids)
+
+
+class StubChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+def make_botto(mottos, queue=None, **overrides):
+    return SimpleNamespace(
+        config=config.parse(overrides), mottos=mottos, moderation_queue=queue
+    )
+
+
+def make_message():
+    return SimpleNamespace(author=SimpleNamespace(dm_channel=StubChannel()))
+
+
+def pending_mottos(count, motto="Words to live by"):
+    return {record_id(n): {"Motto": motto} for n in range(count)}
+
+
+def test_approve_in_batches_of_ten():
+    pending = pending_mottos(25)
+    mottos = StubMottos(pending)
+    botto = make_botto(mottos, dict(pending))
+    message = make_message()
+
+    asyncio.run(moderation.moderate(botto, message, True, list(pending)))
+
+    assert sorted(len(batch) for batch in mottos.batches) == [5, 10, 10]
+    assert all(r["fields"] == {"Approved": True} for b in mottos.batches for r in b)
+    assert botto.moderation_queue == {}
+    assert message.author.dm_channel.sent == ["Approved 25 mottos."]
+
+
+def test_recheck_in_chunks_of_fifty():
+    pending = pending_mottos(120)
+    mottos = StubMottos(pending)
+    botto = make_botto(mottos, dict(pending))
+
+    asyncio.run(moderation.moderate(botto, make_message(), False, list(pending)))
+
+    assert sorted(len(RECORD_ID_FORMULA.findall(f)) for f in mottos.formulas) == [
+        20,
+        50,
+        50,
+    ]
+    assert all(moderation.PENDING_FORMULA in f for f in mottos.formulas)
+    assert sum(len(batch) for batch in mottos.batches) == 120
+
+
+def test_no_longer_pending_removed_and_reported():
+    queue = pending_mottos(2)
+    stale = record_id(1)
+    mottos = StubMottos({record_id(0): queue[record_id(0)]})
+    botto = make_botto(mottos, dict(queue))
+    message = make_message()
+
+    asyncio.run(moderation.moderate(botto, message, False, list(queue)))
+
+    assert mottos.batches == [[record_id(0)]]
+    assert botto.moderation_queue == {}
+    assert message.author.dm_channel.sent == [
+        f"Rejected 1 mottos. Not pending moderation: `{stale}`."
+    ]
+
+
+def test_malformed_ids_never_reach_formula():
+    pending = pending_mottos(1)
+    malformed = "rec')), TRUE(), ('"
+    mottos = StubMottos(pending)
+    botto = make_botto(mottos, {**pending, malformed: {}})
+    message = make_message()
+
+    asyncio.run(moderation.moderate(botto, message, True, [malformed, record_id(0)]))
+
+    assert all(malformed not in f for f in mottos.formulas)
+    assert [r["id"] for r in mottos.batches[0]] == [record_id(0)]
+    assert "Not pending moderation" in message.author.dm_channel.sent[0]
+
+
+def test_queue_reset_when_batch_fails():
+    pending = pending_mottos(3)
+    mottos = StubMottos(pending)
+    botto = make_botto(mottos, dict(pending))
+    message = make_message()
+
+    async def main():
+        await moderation.load_queue(botto)
+        mottos.batch_update = None  # Not callable, so the batch fails
+        await moderation.moderate(botto, message, True, list(pending))
+
+    asyncio.run(main())
+
+    assert botto.moderation_queue is None
+    assert "Something went wrong" in message.author.dm_channel.sent[0]
+
+
+@pytest.mark.parametrize("approve", [True, False])
+def test_reply_when_queue_fails_to_load(approve):
+    botto = make_botto(StubMottos({}, fail=True))
+    message = make_message()
+
+    asyncio.run(moderation.moderate(botto, message, approve, [record_id(0)]))
+    asyncio.run(moderation.queue(botto, message))
+
+    assert botto.moderation_queue is None
+    assert len(message.author.dm_channel.sent) == 2
+    assert all("Something went wrong" in m for m in message.author.dm_channel.sent)
+
+
+def test_unknown_ids_reply_is_limited():
+    botto = make_botto(StubMottos({}), {})
+    message = make_message()
+
+    asyncio.run(
+        moderation.moderate(
+            botto, message, False, ["x" * 1900] * 2 + [str(n) for n in range(500)]
+        )
+    )
+
+    assert len(message.author.dm_channel.sent[0]) < DISCORD_MESSAGE_LIMIT
+
+
+def test_queue_page_fits_in_a_message():
+    pending = pending_mottos(100, motto="x" * 240)
+    botto = make_botto(StubMottos(pending), moderation_page_size=100)
+    message = make_message()
+
+    asyncio.run(moderation.queue(botto, message, "2"))
+
+    page = message.author.dm_channel.sent[0]
+    assert len(page) < DISCORD_MESSAGE_LIMIT
+    assert page.startswith("Mottos pending moderation (page 2 of 4, 100 total)")
+    assert f"`{record_id(25)}`" in page
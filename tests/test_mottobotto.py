@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import config
+from MottoBotto import MottoBotto
+
+
+class StubMembers:
+    def __init__(self, support_users):
+        self.support_users = support_users
+        self.calls = []
+
+    def get_all(self, **options):
+        self.calls.append(threading.current_thread())
+        return [{"fields": fields} for fields in self.support_users]
+
+
+def make_botto(members=None, config_path=None, **overrides):
+    return MottoBotto(
+        config.parse({"trigger_on_mention": False, **overrides}),
+        None,
+        members,
+        config_path,
+    )
+
+
+def write_config(path, **values):
+    path.write_text(json.dumps(values))
+    # Make sure the modification time changes, however coarse the filesystem clock
+    mtime = os.stat(path).st_mtime + 1
+    os.utime(path, (mtime, mtime))
+
+
+def test_help_message_served_from_cache():
+    async def main():
+        members = StubMembers([{"Discord ID": "123"}])
+        botto = make_botto(members)
+        await botto.refresh_support_users()
+        assert members.calls[0] is not threading.main_thread()
+
+        help_message = botto.get_help_message()
+        assert "<@123>" in help_message
+        assert botto.get_help_message() is help_message
+        await asyncio.sleep(0)
+        assert len(members.calls) == 1
+
+    asyncio.run(main())
+
+
+def test_expired_support_users_refreshed_in_background():
+    async def main():
+        members = StubMembers([{"Discord ID": "123"}])
+        botto = make_botto(members)
+        await botto.refresh_support_users()
+        members.support_users = [{"Discord ID": "456"}]
+        botto._support_users_expiry = datetime.now(timezone.utc)
+
+        # The old list is served while the refresh runs
+        assert "<@123>" in botto.get_help_message()
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+        assert "<@456>" in botto.get_help_message()
+        assert len(members.calls) == 2
+
+    asyncio.run(main())
+
+
+def test_help_message_not_cached_before_support_users_fetched():
+    async def main():
+        members = StubMembers([{"Discord ID": "123"}])
+        botto = make_botto(members)
+        assert "<@123>" not in botto.get_help_message()
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+        assert "<@123>" in botto.get_help_message()
+
+    asyncio.run(main())
+
+
+def test_reload_updates_support_users_expiry():
+    async def main():
+        botto = make_botto(StubMembers([]), support_users_refresh_minutes=60)
+        await botto.refresh_support_users()
+        fetched = botto._support_users_fetched
+        botto._apply_config(config.parse({"support_users_refresh_minutes": 5}))
+        assert botto._support_users_expiry == fetched + timedelta(minutes=5)
+
+    asyncio.run(main())
+
+
+def test_invalid_config_rejected(tmp_path):
+    path = tmp_path / "config.json"
+
+    async def main():
+        botto = make_botto(config_path=str(path), watching_status="old")
+        old_config = botto.config
+        botto._help_message = "help"
+
+        path.write_text("{not json")
+        assert not await botto.reload_config()
+        write_config(path, rules={"excluding": ["(o+o+)+$"]})
+        assert not await botto.reload_config()
+
+        assert botto.config is old_config
+        assert botto._help_message == "help"
+
+    asyncio.run(main())
+
+
+def test_valid_config_applied(tmp_path):
+    path = tmp_path / "config.json"
+
+    async def main():
+        botto = make_botto(config_path=str(path))
+        botto._help_message = "help"
+
+        write_config(path, triggers={"new_motto": ["!quote$"]})
+        assert await botto.reload_config()
+
+        assert [t.pattern for t in botto.config["triggers"]["new_motto"]] == [
+            "^!quote$"
+        ]
+        assert botto._help_message is None
+
+    asyncio.run(main())
+
+
+def test_watch_config_idles_while_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr("MottoBotto.CONFIG_WATCH_IDLE_SECONDS", 0.01)
+    path = tmp_path / "config.json"
+    write_config(path, config_reload_seconds=0)
+
+    async def main():
+        botto = make_botto(config_path=str(path), config_reload_seconds=0)
+        stats = []
+        get_config_mtime = botto._get_config_mtime
+        botto._get_config_mtime = lambda: stats.append(1) or get_config_mtime()
+        watcher = asyncio.get_running_loop().create_task(botto.watch_config())
+        try:
+            write_config(path, config_reload_seconds=0, watching_status="new")
+            await asyncio.sleep(0.1)
+            assert not stats
+            assert botto.config["watching_status"] != "new"
+
+            # A reload that sets an interval turns watching back on
+            botto.config["config_reload_seconds"] = 0.01
+            for _ in range(100):
+                await asyncio.sleep(0.05)
+                if botto.config["watching_status"] == "new":
+                    break
+            assert stats
+            assert botto.config["watching_status"] == "new"
+        finally:
+            watcher.cancel()
+
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+import asyncio
+import re
+
+import pytest
+
+import config
+import regex_guard
+
+TIMEOUT = 0.5
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        r"^(a+)+$",
+        r"(o+o+)+$",
+        r"(x+x+)+y",
+        r"^(a|aa)+$",
+        r"(\w+\s?)+!",
+        r"(o*)*p",
+        r"^(\d+|\d)+$",
+        r"^foo(o+o+)+$",
+    ],
+)
+def test_catastrophic_patterns_rejected(pattern):
+    with pytest.raises(ValueError):
+        regex_guard.check_patterns([re.compile(pattern)], 10, 100, TIMEOUT)
+
+
+@pytest.mark.parametrize("pattern", [r"^(ha+)+$", r"^(\S+\s+)\S+", r"<@.*>"])
+def test_unambiguous_patterns_accepted(pattern):
+    regex_guard.check_patterns([re.compile(pattern)], 10, 100, TIMEOUT)
+
+
+def test_slow_pattern_warned_without_reject(caplog):
+    regex_guard.check_patterns([re.compile(r"(o+o+)+$")], 10, None, TIMEOUT)
+    assert "too slow" in caplog.text
+
+
+def test_default_config_accepted():
+    defaults = config.parse({"triggers": {"new_motto": ["!motto$"]}})
+    assert defaults["rules"]["matching"]
+
+
+def test_slow_trigger_rejected():
+    with pytest.raises(ValueError):
+        config.parse({"triggers": {"new_motto": ["(o+o+)+!"]}, "regex_reject_ms": 100})
+
+
+def test_adversarial_inputs_use_pattern_literals():
+    inputs = regex_guard.adversarial_inputs(re.compile(r"^foo(ha+)+$"))
+    assert any(text.startswith("foohaha") and text.endswith("!") for text in inputs)
+    assert all(len(text) <= regex_guard.DISCORD_MESSAGE_LIMIT for text in inputs)
+
+
+def test_is_valid():
+    defaults = config.parse({"triggers": {"new_motto": ["!motto$"]}})
+    rules, triggers = defaults["rules"], defaults["triggers"]["new_motto"]
+    valid, timings = regex_guard.is_valid("Words to live by", rules, triggers)
+    assert valid
+    assert set(timings) == {r.pattern for r in rules["matching"]} | {
+        r.pattern for r in rules["excluding"]
+    } | {t.pattern for t in triggers}
+    assert not regex_guard.is_valid("!motto", rules, triggers)[0]
+
+
+def test_is_trigger():
+    triggers = [re.compile("^!motto$", re.IGNORECASE)]
+    assert regex_guard.is_trigger("!MOTTO", triggers)[0]
+    matched, timings = regex_guard.is_trigger("hello", triggers)
+    assert not matched
+    assert set(timings) == {"^!motto$"}
+
+
+def test_summarise_fits_in_a_message():
+    stats = {}
+    for i in range(100):
+        regex_guard.record(stats, {f"{i}{'x' * 500}": i / 1000})
+    summary = regex_guard.summarise(stats)
+    assert len(summary) < regex_guard.DISCORD_MESSAGE_LIMIT
+    assert summary.startswith("Slowest patterns")
+    assert "and 90 more" in summary
+
+
+def test_find_slow_patterns_records_timeouts():
+    fast = re.compile("^!motto$")
+    slow = re.compile(r"(o+o+)+$")
+    stats = {}
+    worker = regex_guard.RegexWorker()
+    try:
+        asyncio.run(
+            regex_guard.find_slow_patterns(
+                worker,
+                stats,
+                "o" * 30 + "!",
+                [(fast, "match"), (slow, "search")],
+                TIMEOUT,
+            )
+        )
+    finally:
+        worker.close()
+    assert stats[slow.pattern]["timeouts"] == 1
+    assert stats[fast.pattern]["timeouts"] == 0
+    assert stats[fast.pattern]["count"] == 1
+
+
+def test_worker_timeout_only_covers_execution():
+    slow = re.compile(r"(o+o+)+$")
+    trigger = re.compile("^!motto", re.IGNORECASE)
+    worker = regex_guard.RegexWorker()
+
+    async def main():
+        slow_check = asyncio.ensure_future(
+            worker.run(regex_guard.is_trigger, "o" * 40 + "!", [slow], timeout=0.5)
+        )
+        await asyncio.sleep(0.3)
+        fast_check = asyncio.ensure_future(
+            worker.run(regex_guard.is_trigger, "!motto", [trigger], timeout=0.5)
+        )
+        with pytest.raises(asyncio.TimeoutError):
+            await slow_check
+        return await fast_check
+
+    try:
+        matched, timings = asyncio.run(main())
+    finally:
+        worker.close()
+    assert matched
+    assert set(timings) == {trigger.pattern}